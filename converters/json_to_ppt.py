@@ -2,11 +2,20 @@
 JSON to PowerPoint converter.
 Uses centralized Pydantic models from schemas.py
 """
+import asyncio
+import copy
+import hashlib
 import io
 import os
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 
+import aiohttp
+import diskcache
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 logger = logging.getLogger(__name__)
 
@@ -55,13 +64,46 @@ LAYOUTS = {
 # Placeholder type constants
 PH_TITLE, PH_BODY, PH_OBJECT, PH_CHART, PH_TABLE, PH_PICTURE = 1, 2, 7, 8, 12, 18
 
+# Numbered-bullet element, parsed once; each bullet appends a deepcopy since an
+# lxml element can only live in one tree
+_BU_AUTO_NUM_ELEM = parse_xml(
+    '<a:buAutoNum xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main" type="arabicPeriod"/>'
+)
+
+# On-disk cache for Unsplash query -> image bytes (repeat topics skip the network)
+IMAGE_CACHE_TTL = 7 * 86400
+_image_cache = diskcache.Cache(os.path.join(BASE_DIR, ".unsplash_cache"))
+
+
+def _cache_key(query: str) -> str:
+    return hashlib.sha1(query.encode()).hexdigest()
+
+
+# Pooled HTTP session for the sync fetch path: keep-alive reuses the TLS
+# connection across Unsplash calls instead of handshaking per request
+_http = requests.Session()
+_adapter = HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=16,
+    max_retries=Retry(total=2, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504]),
+)
+_http.mount("https://", _adapter)
+_http.mount("http://", _adapter)
+
+
+# Colors used by the built-in table/hyperlink styling, constructed once
+RGB_HEADER_BG = RGBColor(0, 51, 102)
+RGB_WHITE = RGBColor(255, 255, 255)
+RGB_HYPERLINK = RGBColor(0, 0, 255)
+
 
 # === UTILITIES ===
 
+@lru_cache(maxsize=128)
 def hex_to_rgb(hex_color: str) -> RGBColor:
-    """Convert hex color string to RGBColor."""
-    h = hex_color.lstrip('#')
-    return RGBColor(int(h[0:2], 16), int(h[2:4], 16), int(h[4:6], 16))
+    """Convert a '#RRGGBB' color string (schema-validated) to RGBColor."""
+    n = int(hex_color[1:], 16)
+    return RGBColor(n >> 16 & 0xFF, n >> 8 & 0xFF, n & 0xFF)
 
 
 def apply_formatting(run, fmt: TextFormatting):
@@ -72,13 +114,13 @@ def apply_formatting(run, fmt: TextFormatting):
     if fmt.size: run.font.size = Pt(fmt.size)
 
 
-def get_layout(prs: Presentation, name: str):
-    """Get a slide layout by name from the presentation."""
-    for layout in prs.slide_layouts:
-        if layout.name == name:
-            return layout
-    raise PPTGenerationError(f"Layout '{name}' not found", 
-                             {"available": [l.name for l in prs.slide_layouts]})
+def get_layout(layout_by_name: dict, name: str):
+    """Get a slide layout by name from the prebuilt name -> layout map."""
+    try:
+        return layout_by_name[name]
+    except KeyError:
+        raise PPTGenerationError(f"Layout '{name}' not found",
+                                 {"available": list(layout_by_name)})
 
 
 def detect_layout(slide: SlideContent) -> str:
@@ -91,44 +133,43 @@ def detect_layout(slide: SlideContent) -> str:
     if slide.image:
         return LAYOUTS[f"image_{slide.image.position}"]
 
-    # Layout requested by JSON
-    if slide.layout and slide.layout in LAYOUTS:
-        return LAYOUTS[slide.layout]
-
-    # Fallback
-    return LAYOUTS["content_only"]
+    # Layout requested by JSON, falling back to plain content
+    return LAYOUTS.get(slide.layout) or LAYOUTS["content_only"]
 
 
 # === PLACEHOLDER FILLING ===
 
 def fill_text(placeholder, content, bullet_points=None):
-    """Fill a text placeholder with content and/or bullet points."""
+    """Fill a text placeholder with validated content and/or bullet points.
+
+    Expects `content` runs as TextRun and `bullet_points` as BulletPoint —
+    the schema validators normalize raw dicts/strings once at input time.
+    """
     tf = placeholder.text_frame
     tf.clear()
     
     if content:
-        p = tf.paragraphs[0] if tf.paragraphs else tf.add_paragraph()
+        paragraphs = tf.paragraphs
+        p = paragraphs[0] if paragraphs else tf.add_paragraph()
         if isinstance(content, list):
             for run_data in content:
-                if isinstance(run_data, dict): run_data = TextRun(**run_data)
                 run = p.add_run()
                 run.text = run_data.text
                 if run_data.formatting: apply_formatting(run, run_data.formatting)
                 if run_data.hyperlink:
                     run.hyperlink.address = run_data.hyperlink
-                    run.font.color.rgb = RGBColor(0, 0, 255)
+                    run.font.color.rgb = RGB_HYPERLINK
                     run.font.underline = True
         else:
             p.text = str(content)
     
     if bullet_points:
-        for point in bullet_points:
-            bp = BulletPoint(**point) if isinstance(point, dict) else (point if isinstance(point, BulletPoint) else BulletPoint(text=str(point)))
+        for bp in bullet_points:
             p = tf.add_paragraph()
             p.text = bp.text
             p.level = bp.level
             pPr = p._pPr
-            pPr.append(parse_xml('<a:buAutoNum xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main" type="arabicPeriod"/>'))
+            pPr.append(copy.deepcopy(_BU_AUTO_NUM_ELEM))
             if bp.formatting:
                 for run in p.runs: apply_formatting(run, bp.formatting)
 
@@ -143,9 +184,10 @@ def fill_table(placeholder, data: TableData):
         cell.text = str(header)
         if data.style == 'header_colored':
             cell.fill.solid()
-            cell.fill.fore_color.rgb = RGBColor(0, 51, 102)
-            cell.text_frame.paragraphs[0].font.color.rgb = RGBColor(255, 255, 255)
-            cell.text_frame.paragraphs[0].font.bold = True
+            cell.fill.fore_color.rgb = RGB_HEADER_BG
+            header_font = cell.text_frame.paragraphs[0].font
+            header_font.color.rgb = RGB_WHITE
+            header_font.bold = True
     
     for row_idx, row in enumerate(data.rows):
         for col_idx, val in enumerate(row):
@@ -168,21 +210,28 @@ def fetch_image_from_unsplash(query: str) -> io.BytesIO | None:
     if not UNSPLASH_ACCESS_KEY:
         logger.debug("UNSPLASH_ACCESS_KEY not configured, using fallback")
         return None
-    
+
+    key = _cache_key(query)
+    cached = _image_cache.get(key)
+    if cached is not None:
+        logger.debug(f"Unsplash cache hit for: {query}")
+        return io.BytesIO(cached)
+
     try:
         url = "https://api.unsplash.com/search/photos"
         params = {"query": query, "per_page": 1, "orientation": "landscape"}
         headers = {"Authorization": f"Client-ID {UNSPLASH_ACCESS_KEY}"}
         
-        response = requests.get(url, params=params, headers=headers, timeout=10)
+        response = _http.get(url, params=params, headers=headers, timeout=10)
         response.raise_for_status()
         
         data = response.json()
         if data.get("results"):
             image_url = data["results"][0]["urls"]["regular"]
             logger.info(f"Unsplash image found: {image_url[:50]}...")
-            img_response = requests.get(image_url, timeout=15)
+            img_response = _http.get(image_url, timeout=15)
             img_response.raise_for_status()
+            _image_cache.set(key, img_response.content, expire=IMAGE_CACHE_TTL)
             return io.BytesIO(img_response.content)
         else:
             logger.warning(f"No Unsplash image for: {query}")
@@ -192,11 +241,138 @@ def fetch_image_from_unsplash(query: str) -> io.BytesIO | None:
     return None
 
 
-def fill_image(placeholder, data: ImageData):
-    """Insert an image from Unsplash, local path, or fallback placeholder."""
-    
-    # 1. Try Unsplash
-    image_stream = fetch_image_from_unsplash(data.path)
+async def _fetch_one_image(session: aiohttp.ClientSession, query: str) -> tuple[str, io.BytesIO | None]:
+    """Search Unsplash and download the best match for one query (async)."""
+    key = _cache_key(query)
+    cached = _image_cache.get(key)
+    if cached is not None:
+        logger.debug(f"Unsplash cache hit for: {query}")
+        return query, io.BytesIO(cached)
+
+    try:
+        url = "https://api.unsplash.com/search/photos"
+        params = {"query": query, "per_page": 1, "orientation": "landscape"}
+        headers = {"Authorization": f"Client-ID {UNSPLASH_ACCESS_KEY}"}
+
+        async with session.get(url, params=params, headers=headers) as response:
+            response.raise_for_status()
+            data = await response.json()
+
+        if data.get("results"):
+            image_url = data["results"][0]["urls"]["regular"]
+            logger.info(f"Unsplash image found: {image_url[:50]}...")
+            async with session.get(image_url) as img_response:
+                img_response.raise_for_status()
+                content = await img_response.read()
+            _image_cache.set(key, content, expire=IMAGE_CACHE_TTL)
+            return query, io.BytesIO(content)
+        else:
+            logger.warning(f"No Unsplash image for: {query}")
+    except Exception as e:
+        logger.warning(f"Unsplash error: {e}")
+
+    return query, None
+
+
+def _cluster_queries(queries: set[str]) -> list[list[str]]:
+    """Group queries with overlapping keywords (Jaccard >= 0.5 on token sets).
+
+    Each cluster can then be served by a single /search/photos call, which
+    matters on Unsplash's 50-requests/hour free tier.
+    """
+    clusters: list[tuple[set, list]] = []
+    for query in sorted(queries):
+        tokens = set(query.lower().split())
+        for cluster_tokens, members in clusters:
+            union = tokens | cluster_tokens
+            if union and len(tokens & cluster_tokens) / len(union) >= 0.5:
+                members.append(query)
+                cluster_tokens.update(tokens)
+                break
+        else:
+            clusters.append((tokens, [query]))
+    return [members for _, members in clusters]
+
+
+async def _fetch_cluster(session: aiohttp.ClientSession, cluster: list[str]) -> list[tuple[str, io.BytesIO | None]]:
+    """Serve a cluster of similar queries from one batched search call."""
+    results = []
+    pending = []
+    for query in cluster:
+        cached = _image_cache.get(_cache_key(query))
+        if cached is not None:
+            logger.debug(f"Unsplash cache hit for: {query}")
+            results.append((query, io.BytesIO(cached)))
+        else:
+            pending.append(query)
+
+    if not pending:
+        return results
+    if len(pending) == 1:
+        results.append(await _fetch_one_image(session, pending[0]))
+        return results
+
+    try:
+        url = "https://api.unsplash.com/search/photos"
+        joined = " ".join(dict.fromkeys(tok for q in pending for tok in q.split()))
+        params = {"query": joined, "per_page": len(pending), "orientation": "landscape"}
+        headers = {"Authorization": f"Client-ID {UNSPLASH_ACCESS_KEY}"}
+        async with session.get(url, params=params, headers=headers) as response:
+            response.raise_for_status()
+            data = await response.json()
+        photos = data.get("results") or []
+        if len(photos) < len(pending):
+            raise ValueError(f"{len(photos)} results for {len(pending)} queries")
+    except Exception as e:
+        logger.warning(f"Batched Unsplash search failed ({e}), falling back to per-query")
+        fetched = await asyncio.gather(*(_fetch_one_image(session, q) for q in pending))
+        return results + list(fetched)
+
+    async def _download(query: str, photo: dict) -> tuple[str, io.BytesIO | None]:
+        try:
+            image_url = photo["urls"]["regular"]
+            logger.info(f"Unsplash image found: {image_url[:50]}...")
+            async with session.get(image_url) as img_response:
+                img_response.raise_for_status()
+                content = await img_response.read()
+            _image_cache.set(_cache_key(query), content, expire=IMAGE_CACHE_TTL)
+            return query, io.BytesIO(content)
+        except Exception as e:
+            logger.warning(f"Unsplash error: {e}")
+            return query, None
+
+    downloads = await asyncio.gather(*(_download(q, p) for q, p in zip(pending, photos)))
+    return results + list(downloads)
+
+
+async def _fetch_all_images(queries: set[str]) -> dict[str, io.BytesIO | None]:
+    """Download all images concurrently over one pooled HTTP session."""
+    connector = aiohttp.TCPConnector(limit=32)
+    timeout = aiohttp.ClientTimeout(total=15)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        per_cluster = await asyncio.gather(
+            *(_fetch_cluster(session, cluster) for cluster in _cluster_queries(queries))
+        )
+    return {query: stream for results in per_cluster for query, stream in results}
+
+
+def prefetch_images(slides: list[SlideContent]) -> dict[str, io.BytesIO | None]:
+    """Prefetch all slide images concurrently before the pptx assembly loop."""
+    queries = {s.image.path for s in slides if s.image}
+    if not queries or not UNSPLASH_ACCESS_KEY:
+        return {}
+
+    try:
+        return asyncio.run(_fetch_all_images(queries))
+    except RuntimeError:
+        # Already inside an event loop: fall back to sequential sync fetch
+        return {q: fetch_image_from_unsplash(q) for q in queries}
+
+
+def fill_image(placeholder, data: ImageData, image_stream: io.BytesIO | None = None):
+    """Insert a prefetched image, or fall back to local path / placeholder."""
+
+    # 1. Prefetched Unsplash image
     if image_stream:
         try:
             placeholder.insert_picture(image_stream)
@@ -228,24 +404,38 @@ def fill_image(placeholder, data: ImageData):
 
 # === MAIN GENERATOR ===
 
-def generate_presentation_stream(json_data: dict, template_stream: io.BytesIO) -> io.BytesIO:
-    """Generate a PPTX from JSON data and a template."""
-    
-    # Validation
-    try:
-        data = PresentationInput(**json_data)
-    except Exception as e:
-        raise PPTGenerationError("Validation error", {"details": str(e)})
+def generate_presentation_stream(json_data: dict | PresentationInput, template_stream: io.BytesIO,
+                                 image_streams: dict[str, io.BytesIO | None] | None = None) -> io.BytesIO:
+    """Generate a PPTX from JSON data (or an already-validated model) and a template.
+
+    `image_streams` lets a pipelined caller hand in already-downloaded images;
+    otherwise they are prefetched here.
+    """
+
+    # Validation (skipped when the caller hands over a validated model)
+    if isinstance(json_data, PresentationInput):
+        data = json_data
+    else:
+        try:
+            data = PresentationInput(**json_data)
+        except Exception as e:
+            raise PPTGenerationError("Validation error", {"details": str(e)})
     
+    # Prefetch all Unsplash images concurrently (overlaps the network round trips)
+    if image_streams is None:
+        image_streams = prefetch_images(data.slides)
+
     # Load template
     template_stream.seek(0)
     prs = Presentation(template_stream)
+    layout_by_name = {layout.name: layout for layout in prs.slide_layouts}
     
-    # Clear existing slides
-    while prs.slides:
-        rId = prs.slides._sldIdLst[0].rId
+    # Clear existing slides in one pass (deleting from index 0 repeatedly is
+    # quadratic in lxml child bookkeeping)
+    sldIdLst = prs.slides._sldIdLst
+    for rId in [sldId.rId for sldId in sldIdLst]:
         prs.part.drop_rel(rId)
-        del prs.slides._sldIdLst[0]
+    sldIdLst.clear()
     
     # Metadata
     prs.core_properties.title = data.title
@@ -253,34 +443,77 @@ def generate_presentation_stream(json_data: dict, template_stream: io.BytesIO) -
     if data.subject: prs.core_properties.subject = data.subject
     
     # Title slide
-    slide = prs.slides.add_slide(get_layout(prs, LAYOUTS["title_slide"]))
+    slide = prs.slides.add_slide(get_layout(layout_by_name, LAYOUTS["title_slide"]))
     body_phs = [ph for ph in slide.placeholders if ph.placeholder_format.type == PH_BODY]
     if body_phs: body_phs[0].text = data.title
     if len(body_phs) > 1 and data.subtitle: body_phs[1].text = data.subtitle
     
     # Content slides
     for slide_data in data.slides:
-        layout = get_layout(prs, detect_layout(slide_data))
+        layout = get_layout(layout_by_name, detect_layout(slide_data))
         slide = prs.slides.add_slide(layout)
         
-        for ph in slide.placeholders:
-            ph_type = ph.placeholder_format.type
-            
+        # Single pass over the placeholders (each access walks the slide XML)
+        phs = list(slide.placeholders)
+        first_body_idx = next(
+            (fmt.idx for fmt in (p.placeholder_format for p in phs)
+             if fmt.type in (PH_BODY, PH_OBJECT)),
+            None,
+        )
+
+        for ph in phs:
+            # placeholder_format walks lxml attributes on every access: bind once
+            ph_fmt = ph.placeholder_format
+            ph_type = ph_fmt.type
+
             if ph_type == PH_TITLE:
                 ph.text = slide_data.title
             elif ph_type == PH_PICTURE and slide_data.image:
-                fill_image(ph, slide_data.image)
+                fill_image(ph, slide_data.image, image_streams.get(slide_data.image.path))
             elif ph_type == PH_TABLE and slide_data.table:
                 fill_table(ph, slide_data.table)
             elif ph_type == PH_CHART and slide_data.chart:
                 fill_chart(ph, slide_data.chart)
             elif ph_type in (PH_BODY, PH_OBJECT) and (slide_data.content or slide_data.bullet_points):
-                body_placeholders = [p for p in slide.placeholders if p.placeholder_format.type in (PH_BODY, PH_OBJECT)]
-                if body_placeholders and ph.placeholder_format.idx == body_placeholders[0].placeholder_format.idx:
-                     fill_text(ph, slide_data.content, slide_data.bullet_points)
+                if ph_fmt.idx == first_body_idx:
+                    fill_text(ph, slide_data.content, slide_data.bullet_points)
     
     # Export
     output = io.BytesIO()
     prs.save(output)
     output.seek(0)
     return output
+
+
+def generate_presentation_stream_pipelined(slide_events,
+                                           template_stream: io.BytesIO) -> tuple[io.BytesIO, PresentationInput]:
+    """Generate a PPTX from a streaming LLM response, overlapping image downloads.
+
+    Consumes ('slide', dict) / ('done', PresentationInput) events (see
+    generators.llm_generator.stream_presentation_structure) and starts each
+    image download the moment its slide JSON completes on the wire, so the
+    Unsplash round trips run while the rest of the response streams.
+    Returns the pptx stream together with the validated structure.
+    """
+    futures = {}
+    presentation = None
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        for kind, payload in slide_events:
+            if kind == 'slide' and UNSPLASH_ACCESS_KEY:
+                image = payload.get('image') if isinstance(payload, dict) else None
+                query = image.get('path') if isinstance(image, dict) else None
+                if query and query not in futures:
+                    futures[query] = pool.submit(fetch_image_from_unsplash, query)
+            elif kind == 'done':
+                presentation = payload
+        image_streams = {query: future.result() for query, future in futures.items()}
+
+    if presentation is None:
+        raise PPTGenerationError("LLM stream ended without a complete presentation")
+
+    # Cover images the extractor may have missed (it is best-effort)
+    for slide in presentation.slides:
+        if slide.image and slide.image.path not in image_streams:
+            image_streams[slide.image.path] = fetch_image_from_unsplash(slide.image.path)
+
+    return generate_presentation_stream(presentation, template_stream, image_streams), presentation
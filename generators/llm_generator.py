@@ -1,11 +1,14 @@
 """
 LLM-powered presentation structure generator using LangChain and OpenAI.
 """
+import json
+
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.messages import HumanMessage
+from pydantic import ValidationError
 
-from schemas import PresentationInput
+from schemas import PRESENTATION_ADAPTER, PPTGenerationError, PresentationInput
 
 SYSTEM_PROMPT = """You are a senior presentation strategist creating professional PowerPoint presentations.
 
@@ -157,6 +160,132 @@ def create_presentation_agent(api_key: str):
     return prompt | formatting_strategy
 
 
+def _build_user_message(topic: str, slide_count: int | None, language: str) -> HumanMessage:
+    count_clause = f" Target {slide_count} slides." if slide_count else ""
+    lang_clause = f" Write the content in {'French' if language == 'fr' else 'English'}."
+    return HumanMessage(content=f"Create a presentation about: {topic}.{count_clause}{lang_clause}")
+
+
+class _SlideArrayParser:
+    """Incrementally extracts completed slide objects from a streaming JSON document.
+
+    Scans the accumulating response text for the top of the "slides" array,
+    then brace-counts (string-aware) to spot each slide object as soon as its
+    closing brace arrives. Extraction is best-effort: slides that fail
+    json.loads are skipped, and the full document is validated at the end
+    regardless.
+    """
+
+    _ARRAY_HEAD = '"slides"'
+
+    def __init__(self):
+        self._buf = ""
+        self._pos = 0
+        self._in_array = False
+        self._done = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._slide_start = None
+
+    def feed(self, text: str) -> list[dict]:
+        """Consume a chunk of response text, returning any newly completed slides."""
+        self._buf += text
+        if self._done:
+            return []
+        if not self._in_array and not self._seek_array():
+            return []
+        return self._scan()
+
+    def _seek_array(self) -> bool:
+        head = self._buf.find(self._ARRAY_HEAD, self._pos)
+        if head == -1:
+            # Keep a safety margin in case the key is split across chunks
+            self._pos = max(0, len(self._buf) - len(self._ARRAY_HEAD))
+            return False
+        bracket = self._buf.find('[', head)
+        if bracket == -1:
+            return False
+        self._in_array = True
+        self._pos = bracket + 1
+        return True
+
+    def _scan(self) -> list[dict]:
+        slides = []
+        i = self._pos
+        buf = self._buf
+        while i < len(buf):
+            c = buf[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == '\\':
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+            elif c == '"':
+                self._in_string = True
+            elif c == '{':
+                if self._depth == 0:
+                    self._slide_start = i
+                self._depth += 1
+            elif c == '}':
+                self._depth -= 1
+                if self._depth == 0 and self._slide_start is not None:
+                    try:
+                        slides.append(json.loads(buf[self._slide_start:i + 1]))
+                    except ValueError:
+                        pass
+                    self._slide_start = None
+            elif c == ']' and self._depth == 0:
+                self._done = True
+                i += 1
+                break
+            i += 1
+        self._pos = i
+        return slides
+
+
+def stream_presentation_structure(topic: str, api_key: str, slide_count: int | None = None, language: str = "en"):
+    """
+    Stream a presentation structure from a topic using LLM.
+
+    Yields ('slide', dict) as each slide's JSON completes on the wire — so
+    callers can start downstream work (e.g. image prefetch) while the rest of
+    the response streams — then ('done', PresentationInput) with the fully
+    validated structure.
+    """
+    # Same schema conditioning as the non-streaming structured-output path;
+    # chat completions supports json_schema while streaming
+    llm = ChatOpenAI(
+        model="gpt-4o-2024-08-06",
+        temperature=0.6,
+        api_key=api_key,
+        streaming=True,
+    ).bind(response_format={
+        "type": "json_schema",
+        "json_schema": {"name": "presentation", "schema": PresentationInput.model_json_schema()},
+    })
+
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", SYSTEM_PROMPT),
+        MessagesPlaceholder(variable_name="messages")
+    ])
+
+    parser = _SlideArrayParser()
+    pieces = []
+    for chunk in (prompt | llm).stream({"messages": [_build_user_message(topic, slide_count, language)]}):
+        text = chunk.content or ""
+        pieces.append(text)
+        for slide in parser.feed(text):
+            yield ('slide', slide)
+
+    try:
+        yield ('done', PRESENTATION_ADAPTER.validate_json("".join(pieces)))
+    except ValidationError as e:
+        raise PPTGenerationError("Validation error", {"details": str(e)})
+
+
 def generate_presentation_structure(
     topic: str, 
     api_key: str, 
@@ -176,12 +305,9 @@ def generate_presentation_structure(
         PresentationInput: Validated presentation structure
     """
     agent = create_presentation_agent(api_key)
-    
-    count_clause = f" Target {slide_count} slides." if slide_count else ""
-    lang_clause = f" Write the content in {'French' if language == 'fr' else 'English'}."
-    
+
     response = agent.invoke({
-        "messages": [HumanMessage(content=f"Create a presentation about: {topic}.{count_clause}{lang_clause}")]
+        "messages": [_build_user_message(topic, slide_count, language)]
     })
-    
+
     return response
@@ -2,23 +2,29 @@
 Pydantic models for presentation structure validation.
 """
 from typing import List, Optional, Union, Literal
-from pydantic import BaseModel, Field, field_validator, model_validator
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter, field_validator, model_validator
 
 
 class TextFormatting(BaseModel):
+    model_config = ConfigDict(frozen=True, extra='forbid')
+
     bold: bool = False
     italic: bool = False
-    color: Optional[str] = Field(None, description="Hex color code #RRGGBB")
+    color: Optional[str] = Field(None, pattern=r'^#[0-9A-Fa-f]{6}$', description="Hex color code #RRGGBB")
     size: Optional[float] = None
 
 
 class TextRun(BaseModel):
+    model_config = ConfigDict(frozen=True, extra='forbid')
+
     text: str
     formatting: Optional[TextFormatting] = None
     hyperlink: Optional[str] = None
 
 
 class BulletPoint(BaseModel):
+    model_config = ConfigDict(frozen=True, extra='forbid')
+
     text: str
     level: int = Field(default=0, ge=0, le=5, description="Indentation level 0-5")
     formatting: Optional[TextFormatting] = None
@@ -31,6 +37,8 @@ class TableData(BaseModel):
 
 
 class ChartSeries(BaseModel):
+    model_config = ConfigDict(frozen=True, extra='forbid')
+
     name: str
     data: List[Union[int, float]]
 
@@ -49,11 +57,14 @@ class ImageData(BaseModel):
 class SlideContent(BaseModel):
     title: str = Field(..., min_length=1, max_length=200)
     content: Optional[Union[str, List[TextRun]]] = None
-    bullet_points: Optional[List[Union[str, BulletPoint]]] = None
+    bullet_points: Optional[List[BulletPoint]] = None
     table: Optional[TableData] = None
     chart: Optional[ChartData] = None
     image: Optional[ImageData] = None
-    layout: Optional[str] = Field(None, description="Layout hint: content_only, image_left, image_right, etc.")
+    layout: Optional[Literal[
+        'title_slide', 'content_only', 'image_right', 'image_left', 'image_full',
+        'table', 'chart', 'chart_with_text', 'two_columns',
+    ]] = Field(None, description="Layout hint: content_only, image_left, image_right, etc.")
 
     @field_validator('content', mode='before')
     @classmethod
@@ -96,6 +107,11 @@ class PresentationInput(BaseModel):
     slides: List[SlideContent] = Field(..., min_length=1)
 
 
+# Prebuilt validator: validate_json parses and validates raw bytes in one
+# pydantic-core pass, skipping the stdlib json -> dict -> model detour
+PRESENTATION_ADAPTER = TypeAdapter(PresentationInput)
+
+
 class PPTGenerationError(Exception):
     """Error during PowerPoint generation."""
     def __init__(self, message: str, details: dict = None):
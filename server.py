@@ -5,18 +5,44 @@ import logging
 import base64
 import os
 import io
+from concurrent.futures import ThreadPoolExecutor
 
-from flask import Flask, request, jsonify, send_from_directory
+import orjson
+from flask import Flask, request, jsonify, send_file, send_from_directory
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-from converters.json_to_ppt import generate_presentation_stream, PPTGenerationError
-from generators.llm_generator import generate_presentation_structure
+import fastjsonschema
+from pydantic import ValidationError
+
+from converters.json_to_ppt import (
+    generate_presentation_stream,
+    generate_presentation_stream_pipelined,
+    PPTGenerationError,
+)
+from generators.llm_generator import stream_presentation_structure
+from schemas import PRESENTATION_ADAPTER, PresentationInput
+
+# Compiled once at import: codegen'd validator used to reject malformed slides
+# payloads with a fast, pointed error message
+_VALIDATE_PRESENTATION = fastjsonschema.compile(PresentationInput.model_json_schema())
+
+class ORJSONProvider(DefaultJSONProvider):
+    """JSON provider backed by orjson's SIMD-accelerated parser/serializer."""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 
 app = Flask(__name__, static_folder='static')
-CORS(app)
+app.json = ORJSONProvider(app)
+CORS(app, expose_headers=['Content-Disposition', 'X-Presentation-Structure'])
 
 TEMPLATE_PATH = os.path.join(os.path.dirname(__file__), 'templates', 'template.pptx')
 
@@ -27,6 +53,21 @@ if not OPENAI_API_KEY:
 
 IMAGES_PATH = os.path.join(os.path.dirname(__file__), 'images')
 
+# Pool used to overlap the template disk read with the LLM round trip
+_executor = ThreadPoolExecutor(max_workers=2)
+
+# Template bytes are immutable, so one shared buffer serves every request;
+# loaded lazily so the server still starts (and /health reports) without it
+_template_bytes: bytes | None = None
+
+
+def _get_template_stream() -> io.BytesIO:
+    global _template_bytes
+    if _template_bytes is None:
+        with open(TEMPLATE_PATH, 'rb') as f:
+            _template_bytes = f.read()
+    return io.BytesIO(_template_bytes)
+
 @app.route('/')
 def index():
     return send_from_directory(app.static_folder, 'index.html')
@@ -40,58 +81,86 @@ def serve_image(filename):
 @app.route('/generate-ppt', methods=['POST'])
 def generate_ppt():
     try:
-        req_data = request.json
-        if not req_data:
+        raw_body = request.get_data()
+        if not raw_body:
             return jsonify({"error": "No data provided"}), 400
 
-        # Case 1: Generate from topic
-        if 'topic' in req_data:
-            if not OPENAI_API_KEY:
-                return jsonify({"error": "OPENAI_API_KEY not configured. Set it with: export OPENAI_API_KEY='your-key'"}), 500
-            topic = req_data['topic']
-            slide_count = req_data.get('slide_count', 8)
-            language = req_data.get('language', 'en')
-            
-            # Validate slide_count (5-15)
-            if not isinstance(slide_count, int) or slide_count < 5 or slide_count > 15:
-                slide_count = max(5, min(15, int(slide_count) if slide_count else 8))
-            
-            logger.info(f"Generating presentation for: {topic} (slides: {slide_count}, lang: {language})")
-            
-            # Call LLM generator
-            ppt_structure = generate_presentation_structure(topic, OPENAI_API_KEY, slide_count, language)
-            
-            # Pydantic -> Dict
-            json_data = ppt_structure.model_dump()
-            
-        # Case 2: Generate from JSON directly
-        elif 'slides' in req_data:
-            json_data = req_data
-        else:
-            return jsonify({"error": "Invalid request. Provide 'topic' or 'slides'."}), 400
-
-        # Check template exists
-        if not os.path.exists(TEMPLATE_PATH):
+        # Start fetching the template now; the LLM call below takes seconds
+        template_future = _executor.submit(_get_template_stream)
+
+        # Case 2 fast path: a direct slides payload parses and validates
+        # straight from the raw bytes in one pydantic-core pass
+        presentation = None
+        slide_events = None
+        validation_error = None
+        try:
+            presentation = PRESENTATION_ADAPTER.validate_json(raw_body)
+        except ValidationError as e:
+            validation_error = e
+
+        if presentation is None:
+            req_data = request.get_json(silent=True)
+            if not req_data:
+                return jsonify({"error": "No data provided"}), 400
+
+            # Case 1: Generate from topic
+            if 'topic' in req_data:
+                if not OPENAI_API_KEY:
+                    return jsonify({"error": "OPENAI_API_KEY not configured. Set it with: export OPENAI_API_KEY='your-key'"}), 500
+                topic = req_data['topic']
+                slide_count = req_data.get('slide_count', 8)
+                language = req_data.get('language', 'en')
+
+                # Validate slide_count (5-15)
+                if not isinstance(slide_count, int) or slide_count < 5 or slide_count > 15:
+                    slide_count = max(5, min(15, int(slide_count) if slide_count else 8))
+
+                logger.info(f"Generating presentation for: {topic} (slides: {slide_count}, lang: {language})")
+
+                # Stream the LLM response; consumed lazily below so image
+                # downloads overlap the remaining token arrival
+                slide_events = stream_presentation_structure(topic, OPENAI_API_KEY, slide_count, language)
+
+            # Case 2: direct slides payload that failed validation; the
+            # compiled validator pinpoints the first offending field cheaply
+            elif 'slides' in req_data:
+                try:
+                    _VALIDATE_PRESENTATION(req_data)
+                except fastjsonschema.JsonSchemaException as e:
+                    raise PPTGenerationError("Validation error", {"details": e.message})
+                raise PPTGenerationError("Validation error", {"details": str(validation_error)})
+            else:
+                return jsonify({"error": "Invalid request. Provide 'topic' or 'slides'."}), 400
+
+        # Collect the template read (already done while the LLM was working)
+        try:
+            template_stream = template_future.result()
+        except FileNotFoundError:
             logger.error(f"Template not found: {TEMPLATE_PATH}")
             return jsonify({"error": f"Template missing: {TEMPLATE_PATH}"}), 500
 
-        # Generate PPTX
-        with open(TEMPLATE_PATH, 'rb') as f:
-            template_stream = io.BytesIO(f.read())
-
         logger.info("Generating PPTX...")
-        ppt_stream = generate_presentation_stream(json_data, template_stream)
+        if slide_events is not None:
+            ppt_stream, presentation = generate_presentation_stream_pipelined(slide_events, template_stream)
+        else:
+            ppt_stream = generate_presentation_stream(presentation, template_stream)
         logger.info("Generation complete")
-        ppt_base64 = base64.b64encode(ppt_stream.read()).decode('utf-8')
 
-        filename = f"{json_data.get('title', 'presentation')}.pptx"
+        filename = f"{presentation.title}.pptx"
         filename = "".join(c for c in filename if c.isalnum() or c in ' -_.').strip()
 
-        return jsonify({
-            "filename": filename, 
-            "file_base64": ppt_base64,
-            "structure": json_data
-        })
+        # Stream the binary directly; the structure rides in a header
+        # (base64 keeps the header value latin-1 safe)
+        response = send_file(
+            ppt_stream,
+            mimetype='application/vnd.openxmlformats-officedocument.presentationml.presentation',
+            as_attachment=True,
+            download_name=filename,
+        )
+        # model_dump happens exactly once, and only for the returned structure
+        structure_b64 = base64.b64encode(orjson.dumps(presentation.model_dump())).decode('ascii')
+        response.headers['X-Presentation-Structure'] = structure_b64
+        return response
 
     except PPTGenerationError as e:
         logger.warning(f"Generation error: {e.message}")